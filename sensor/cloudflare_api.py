@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP session setup for the Cloudflare D1 REST API
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def create_session(api_token: str, status_forcelist, read_retries=None) -> requests.Session:
+    """Create a pooled, authenticated session.
+    
+    Every D1 call is a POST, which urllib3 won't retry on a bad status by
+    default, so POST is allowed explicitly. Callers choose which statuses are
+    safe to retry for the statements they send. A read error means the server
+    may already have run the statement, so non-idempotent callers should pass
+    read_retries=0.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        read=read_retries,
+        backoff_factor=0.5,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset({"POST"})
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+    session.headers.update({
+        'Authorization': f'Bearer {api_token}',
+        'Content-Type': 'application/json'
+    })
+    return session
@@ -3,36 +3,47 @@
 Initialize the D1 database schema for busyness monitoring
 """
 
-import requests
 import json
 import sys
 import os
+import copy
+from functools import lru_cache
 
-def load_config():
-    """Load configuration from config.json"""
+from cloudflare_api import create_session
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@lru_cache(maxsize=1)
+def _read_config(path, mtime):
+    """Parse a config file; cached per path and modification time"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load_config(path='config.json'):
+    """Load configuration from a JSON file (config.json by default)"""
     try:
-        with open('config.json', 'r') as f:
-            return json.load(f)
+        # Copy so callers can't modify the cached config
+        return copy.deepcopy(_read_config(path, os.path.getmtime(path)))
     except FileNotFoundError:
-        print("❌ config.json not found. Please run setup.py first.")
+        print(f"❌ {path} not found. Please run setup.py first.")
         return None
     except json.JSONDecodeError as e:
-        print(f"❌ Error parsing config.json: {e}")
+        print(f"❌ Error parsing {path}: {e}")
         return None
 
-def create_database_schema(config):
+def create_database_schema(config, session):
     """Create the database schema in D1"""
-    api_token = config['cloudflare']['api_token']
     account_id = config['cloudflare']['account_id']
     database_id = config['cloudflare']['database_id']
     
     base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/d1/database/{database_id}"
     
-    headers = {
-        'Authorization': f'Bearer {api_token}',
-        'Content-Type': 'application/json'
-    }
-    
     # SQL statements to create the schema
     sql_statements = [
         """
@@ -62,61 +73,58 @@ def create_database_schema(config):
     
     print("🔧 Creating database schema...")
     
-    for i, sql in enumerate(sql_statements, 1):
-        print(f"   Executing statement {i}/{len(sql_statements)}...")
+    # D1's /query endpoint accepts several semicolon-separated statements in one
+    # request and returns one result entry per statement
+    payload = {
+        'sql': ";\n".join(sql.strip() for sql in sql_statements)
+    }
+    
+    try:
+        response = session.post(
+            f"{base_url}/query",
+            json=payload,
+            timeout=30
+        )
         
-        payload = {
-            'sql': sql
-        }
+        if response.status_code != 200:
+            print(f"   ❌ Schema creation failed: {response.status_code} - {response.text}")
+            return False
         
-        try:
-            response = requests.post(
-                f"{base_url}/query",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success', False):
-                    print(f"   ✅ Statement {i} executed successfully")
-                else:
-                    print(f"   ❌ Statement {i} failed: {result.get('errors', 'Unknown error')}")
-                    return False
+        result = response.json()
+        if not result.get('success', False):
+            print(f"   ❌ Schema creation failed: {result.get('errors', 'Unknown error')}")
+            return False
+        
+        statement_results = result.get('result', [])
+        for i, statement_result in enumerate(statement_results, 1):
+            if statement_result.get('success', False):
+                print(f"   ✅ Statement {i}/{len(sql_statements)} executed successfully")
             else:
-                print(f"   ❌ Statement {i} failed: {response.status_code} - {response.text}")
+                print(f"   ❌ Statement {i}/{len(sql_statements)} failed: {statement_result.get('error', 'Unknown error')}")
                 return False
-                
-        except Exception as e:
-            print(f"   ❌ Error executing statement {i}: {e}")
-            return False
+            
+    except Exception as e:
+        print(f"   ❌ Error executing schema statements: {e}")
+        return False
     
     print("✅ Database schema created successfully!")
     return True
 
-def test_database_connection(config):
+def test_database_connection(config, session):
     """Test the database connection"""
-    api_token = config['cloudflare']['api_token']
     account_id = config['cloudflare']['account_id']
     database_id = config['cloudflare']['database_id']
     
     base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/d1/database/{database_id}"
     
-    headers = {
-        'Authorization': f'Bearer {api_token}',
-        'Content-Type': 'application/json'
-    }
-    
     # Test query
     payload = {
         'sql': 'SELECT name FROM sqlite_master WHERE type="table" AND name="busyness_data"'
     }
     
     try:
-        response = requests.post(
+        response = session.post(
             f"{base_url}/query",
-            headers=headers,
             json=payload,
             timeout=30
         )
@@ -154,21 +162,27 @@ def main():
     
     print(f"📋 Using database: {config['cloudflare']['database_id']}")
     
+    # The DDL uses IF NOT EXISTS and the check is a SELECT, so retries are safe
+    with create_session(config['cloudflare']['api_token'], status_forcelist=[429, 500, 502, 503, 504]) as session:
+        return initialize_database(config, session)
+
+def initialize_database(config, session):
+    """Test the connection, create the schema and verify it"""
     # Test connection first
     print("\n🔍 Testing database connection...")
-    if not test_database_connection(config):
+    if not test_database_connection(config, session):
         print("❌ Database connection test failed")
         return 1
     
     # Create schema
     print("\n🔧 Creating database schema...")
-    if not create_database_schema(config):
+    if not create_database_schema(config, session):
         print("❌ Failed to create database schema")
         return 1
     
     # Test again to verify
     print("\n🔍 Verifying schema creation...")
-    if test_database_connection(config):
+    if test_database_connection(config, session):
         print("\n🎉 Database initialization complete!")
         print("   You can now run the busyness monitor.")
         return 0
@@ -10,10 +10,26 @@ import time
 import requests
 import json
 import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 import argparse
+from enum import Enum
+
+from cloudflare_api import create_session
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +42,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def dumps_json(obj) -> str:
+    """Serialize to a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+def loads_json(text: str):
+    """Parse a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+# Frames are downscaled to this (width, height) before analysis
+ANALYSIS_SIZE = (320, 180)
+# Smallest object counted, as a fraction of the frame (100 px at 1280x720)
+MIN_OBJECT_AREA_FRACTION = 100 / (1280 * 720)
+
+# Buffered frames discarded before each capture; not every backend honours
+# CAP_PROP_BUFFERSIZE (AVFoundation doesn't)
+STALE_FRAMES_TO_DROP = 4
+
+# Mean absolute gray-level change below which a frame counts as unchanged
+STATIC_FRAME_THRESHOLD = 1.0
+
+# Columns written for each sample in busyness_data
+UPLOAD_COLUMNS = (
+    'timestamp', 'score', 'motion_ratio', 'edge_ratio',
+    'color_variance', 'texture_variance', 'contour_count',
+    'combined_raw', 'metadata', 'notes', 'camera_name'
+)
+# D1 allows at most 100 bound parameters per query
+MAX_ROWS_PER_INSERT = 100 // len(UPLOAD_COLUMNS)
+# Longest time a queued sample waits for others to share its upload
+UPLOAD_BATCH_WAIT = 10
+# HTTP statuses worth retrying; other 4xx responses reject the rows themselves.
+# Auth failures and 404 (wrong account or database ID) are retried so a
+# misconfiguration doesn't discard spooled samples.
+RETRYABLE_STATUS_CODES = {401, 403, 404, 408, 429}
+
+class UploadResult(Enum):
+    """Outcome of an upload attempt"""
+    OK = "ok"
+    RETRY = "retry"        # transient failure, try the same rows again later
+    REJECTED = "rejected"  # D1 refused the rows, retrying won't help
+
+def _reduce_frame_cv(gray: np.ndarray, motion_mask: np.ndarray, edges: np.ndarray) -> Tuple[int, int, float]:
+    """Return (motion pixels, edge pixels, gray variance) using OpenCV reductions"""
+    _, stddev = cv2.meanStdDev(gray)
+    return cv2.countNonZero(motion_mask), cv2.countNonZero(edges), float(stddev[0, 0]) ** 2
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """Variance of the Laplacian; int16 output is wide enough for 8-bit input"""
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+    _, stddev = cv2.meanStdDev(laplacian)
+    return float(stddev[0, 0]) ** 2
+
+if njit is not None:
+    # A 320x180 frame is too small for parallel=True to pay for its thread dispatch
+    @njit(cache=True, fastmath=True)
+    def _reduce_frame_jit(gray, motion_mask, edges):
+        """Return (motion pixels, edge pixels, gray variance) in a single pass"""
+        rows, cols = gray.shape
+        motion_pixels = 0
+        edge_pixels = 0
+        total = 0.0
+        total_sq = 0.0
+        for y in range(rows):
+            for x in range(cols):
+                value = float(gray[y, x])
+                total += value
+                total_sq += value * value
+                if motion_mask[y, x] != 0:
+                    motion_pixels += 1
+                if edges[y, x] != 0:
+                    edge_pixels += 1
+        n = rows * cols
+        mean = total / n
+        return motion_pixels, edge_pixels, total_sq / n - mean * mean
+    
+    reduce_frame = _reduce_frame_jit
+else:
+    reduce_frame = _reduce_frame_cv
+
 class BusynessEvaluator:
     """Evaluates how 'busy' a scene is using computer vision techniques"""
     
@@ -35,6 +134,20 @@ class BusynessEvaluator:
             detectShadows=True, 
             varThreshold=50
         )
+        # Per-resolution constants and reusable output buffers, set up on the
+        # first frame and whenever the input frame shape changes
+        self._input_shape = None
+        self._inv_area = None
+        self._small = None
+        self._gray_buffers = None
+        self._edges = None
+        self._min_object_area = None
+        # Last fully analyzed frame and its metadata, whose static factors are
+        # reused while the scene doesn't change
+        self._prev_gray = None
+        self._prev_result = None
+        # OpenCV releases the GIL, so independent kernels can run side by side
+        self._pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="analysis")
         
     def calculate_busyness_score(self, image: np.ndarray) -> Tuple[int, dict]:
         """
@@ -47,66 +160,121 @@ class BusynessEvaluator:
         Returns: (score, metadata)
         """
         try:
-            # Convert to grayscale for analysis
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            if image.shape != self._input_shape:
+                self._allocate_buffers(image)
             
-            # 1. Motion detection using background subtraction
-            motion_mask = self.bg_subtractor.apply(image)
-            motion_pixels = np.sum(motion_mask > 0)
-            motion_ratio = motion_pixels / (image.shape[0] * image.shape[1])
+            # A 1-10 score doesn't need full resolution; analyze a small copy
+            image = cv2.resize(image, ANALYSIS_SIZE, dst=self._small, interpolation=cv2.INTER_AREA)
             
-            # 2. Edge density (Canny edge detection)
-            edges = cv2.Canny(gray, 50, 150)
-            edge_pixels = np.sum(edges > 0)
-            edge_ratio = edge_pixels / (image.shape[0] * image.shape[1])
+            # Convert to grayscale for analysis, into whichever buffer isn't
+            # holding the previous frame
+            gray = self._gray_buffers[0] if self._gray_buffers[1] is self._prev_gray else self._gray_buffers[1]
+            cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=gray)
             
-            # 3. Color variance (higher variance = more activity)
-            color_variance = np.var(image)
-            normalized_variance = min(color_variance / 10000, 1.0)  # Normalize to 0-1
+            # When the frame barely changed, reuse the previous static factors and
+            # only run motion detection, which keeps the background model learning
+            if self._prev_gray is not None:
+                diff = cv2.norm(gray, self._prev_gray, cv2.NORM_L1) * self._inv_area
+                if diff < STATIC_FRAME_THRESHOLD:
+                    motion_mask = self.bg_subtractor.apply(image)
+                    motion_ratio = float(cv2.countNonZero(motion_mask)) * self._inv_area
+                    prev = self._prev_result
+                    return self._combine_factors(
+                        motion_ratio, prev['edge_ratio'], prev['color_variance'],
+                        prev['texture_variance'], prev['contour_count']
+                    )
             
+            # Run the independent kernels concurrently:
+            # 1. Motion detection using background subtraction
+            # 2. Edge density (Canny edge detection)
             # 4. Texture analysis using Laplacian variance
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            normalized_laplacian = min(laplacian_var / 1000, 1.0)
+            f_motion = self._pool.submit(self.bg_subtractor.apply, image)
+            f_edges = self._pool.submit(cv2.Canny, gray, 50, 150, edges=self._edges)
+            f_laplacian = self._pool.submit(laplacian_variance, gray)
+            motion_mask = f_motion.result()
+            edges = f_edges.result()
+            laplacian_var = f_laplacian.result()
             
-            # 5. Contour detection for object counting
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            contour_count = len([c for c in contours if cv2.contourArea(c) > 100])
-            normalized_contours = min(contour_count / 20, 1.0)  # Normalize to 0-1
+            # 3. Intensity variance (higher variance = more activity),
+            # reduced together with the motion and edge pixel counts
+            motion_pixels, edge_pixels, color_variance = reduce_frame(gray, motion_mask, edges)
+            motion_ratio = float(motion_pixels) * self._inv_area
+            edge_ratio = float(edge_pixels) * self._inv_area
             
-            # Combine factors with weights
-            weights = {
-                'motion': 0.3,
-                'edges': 0.2,
-                'variance': 0.2,
-                'texture': 0.15,
-                'contours': 0.15
-            }
+            # 5. Connected edge components for object counting (label 0 is background).
+            # An edge component is only its outline, so its bounding box stands in
+            # for the area an external contour would enclose.
+            _, _, stats, _ = cv2.connectedComponentsWithStats(edges, connectivity=8)
+            box_areas = stats[1:, cv2.CC_STAT_WIDTH] * stats[1:, cv2.CC_STAT_HEIGHT]
+            contour_count = int(np.count_nonzero(box_areas > self._min_object_area))
             
-            combined_score = (
-                weights['motion'] * motion_ratio +
-                weights['edges'] * edge_ratio +
-                weights['variance'] * normalized_variance +
-                weights['texture'] * normalized_laplacian +
-                weights['contours'] * normalized_contours
+            busyness_score, metadata = self._combine_factors(
+                motion_ratio, edge_ratio, color_variance, laplacian_var, contour_count
             )
+            self._prev_gray = gray
+            self._prev_result = metadata
             
-            # Convert to 1-10 scale
-            busyness_score = max(1, min(10, int(combined_score * 9 + 1)))
-            
-            metadata = {
-                'motion_ratio': float(motion_ratio),
-                'edge_ratio': float(edge_ratio),
-                'color_variance': float(color_variance),
-                'texture_variance': float(laplacian_var),
-                'contour_count': int(contour_count),
-                'combined_raw': float(combined_score)
-            }
-            
-            return busyness_score, metadata
+            return busyness_score, dict(metadata)
             
         except Exception as e:
             logger.error(f"Error calculating busyness score: {e}")
             return 5, {'error': str(e)}  # Default middle score on error
+    
+    def _combine_factors(self, motion_ratio: float, edge_ratio: float, color_variance: float,
+                         laplacian_var: float, contour_count: int) -> Tuple[int, dict]:
+        """Weight the individual factors into a 1-10 score and its metadata"""
+        normalized_variance = min(color_variance / 10000, 1.0)  # Normalize to 0-1
+        normalized_laplacian = min(laplacian_var / 1000, 1.0)
+        normalized_contours = min(contour_count / 20, 1.0)  # Normalize to 0-1
+        
+        # Combine factors with weights
+        weights = {
+            'motion': 0.3,
+            'edges': 0.2,
+            'variance': 0.2,
+            'texture': 0.15,
+            'contours': 0.15
+        }
+        
+        combined_score = (
+            weights['motion'] * motion_ratio +
+            weights['edges'] * edge_ratio +
+            weights['variance'] * normalized_variance +
+            weights['texture'] * normalized_laplacian +
+            weights['contours'] * normalized_contours
+        )
+        
+        # Convert to 1-10 scale. Every factor is at most 1, but the fastmath
+        # variance can come out slightly negative, so clamp both ends.
+        busyness_score = max(1, min(10, int(combined_score * 9 + 1)))
+        
+        metadata = {
+            'motion_ratio': float(motion_ratio),
+            'edge_ratio': float(edge_ratio),
+            'color_variance': float(color_variance),
+            'texture_variance': float(laplacian_var),
+            'contour_count': int(contour_count),
+            'combined_raw': float(combined_score)
+        }
+        
+        return busyness_score, metadata
+    
+    def _allocate_buffers(self, image: np.ndarray):
+        """Allocate per-frame buffers for the analysis resolution"""
+        width, height = ANALYSIS_SIZE
+        self._input_shape = image.shape
+        area = width * height
+        self._inv_area = 1.0 / area
+        self._min_object_area = MIN_OBJECT_AREA_FRACTION * area
+        self._small = np.empty((height, width) + image.shape[2:], dtype=image.dtype)
+        self._gray_buffers = (np.empty((height, width), np.uint8), np.empty((height, width), np.uint8))
+        self._edges = np.empty((height, width), np.uint8)
+        self._prev_gray = None
+        self._prev_result = None
+    
+    def close(self):
+        """Shut down the analysis thread pool"""
+        self._pool.shutdown(wait=True)
 
 class CameraCapture:
     """Handles camera capture and image processing"""
@@ -123,10 +291,12 @@ class CameraCapture:
                 logger.error(f"Could not open camera {self.camera_index}")
                 return False
             
-            # Set camera properties for better quality
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+            # Frames are downscaled for analysis, so a modest resolution is enough
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 360)
             self.cap.set(cv2.CAP_PROP_FPS, 30)
+            # Keep as few frames queued as the backend allows so captures are fresh
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             
             logger.info(f"Camera {self.camera_index} initialized successfully")
             return True
@@ -142,7 +312,10 @@ class CameraCapture:
                 logger.error("Camera not initialized")
                 return None
             
-            ret, frame = self.cap.read()
+            # Drop frames the driver buffered since the last capture
+            for _ in range(STALE_FRAMES_TO_DROP):
+                self.cap.grab()
+            ret, frame = self.cap.retrieve()
             if not ret:
                 logger.error("Failed to capture image")
                 return None
@@ -168,71 +341,169 @@ class CloudflareUploader:
         self.database_id = database_id
         self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/d1/database/{database_id}"
         
-    def upload_busyness_data(self, score: int, metadata: dict, timestamp: str, notes: str = "", camera_name: str = "") -> bool:
-        """Upload busyness data to D1 database"""
+        # Keep one pooled session so uploads reuse the same TLS connection.
+        # Only statuses that mean the INSERT wasn't applied are retried in place,
+        # and read errors (the INSERT may already have run) aren't retried at all;
+        # other failures are left to the spool.
+        self.session = create_session(api_token, status_forcelist=[429, 503], read_retries=0)
+        
+    def flush_batch(self, rows: List[dict], notes: str = "", camera_name: str = "") -> UploadResult:
+        """Upload up to MAX_ROWS_PER_INSERT samples as one multi-row INSERT.
+        
+        A single statement commits all rows or none, so the result always
+        applies to the whole batch.
+        """
+        if len(rows) > MAX_ROWS_PER_INSERT:
+            raise ValueError(f"flush_batch accepts at most {MAX_ROWS_PER_INSERT} rows, got {len(rows)}")
+        
         try:
             # Prepare the SQL query
-            sql_query = """
-            INSERT INTO busyness_data (timestamp, score, motion_ratio, edge_ratio, 
-                                     color_variance, texture_variance, contour_count, 
-                                     combined_raw, metadata, notes, camera_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
+            placeholders = "(" + ", ".join(["?"] * len(UPLOAD_COLUMNS)) + ")"
+            sql_query = (
+                f"INSERT INTO busyness_data ({', '.join(UPLOAD_COLUMNS)}) VALUES "
+                + ", ".join([placeholders] * len(rows))
+            )
             
             # Prepare parameters
-            params = [
-                timestamp,
-                score,
-                metadata.get('motion_ratio', 0),
-                metadata.get('edge_ratio', 0),
-                metadata.get('color_variance', 0),
-                metadata.get('texture_variance', 0),
-                metadata.get('contour_count', 0),
-                metadata.get('combined_raw', 0),
-                json.dumps(metadata),
-                notes,
-                camera_name
-            ]
+            params = []
+            for row in rows:
+                metadata = row['metadata']
+                params.extend([
+                    row['timestamp'],
+                    row['score'],
+                    metadata.get('motion_ratio', 0),
+                    metadata.get('edge_ratio', 0),
+                    metadata.get('color_variance', 0),
+                    metadata.get('texture_variance', 0),
+                    metadata.get('contour_count', 0),
+                    metadata.get('combined_raw', 0),
+                    dumps_json(metadata),
+                    row.get('notes', notes),
+                    row.get('camera_name', camera_name)
+                ])
             
             # Make API request
-            headers = {
-                'Authorization': f'Bearer {self.api_token}',
-                'Content-Type': 'application/json'
-            }
-            
             payload = {
                 'sql': sql_query,
                 'params': params
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/query",
-                headers=headers,
                 json=payload,
                 timeout=30
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success', False):
-                    logger.info(f"Successfully uploaded data: score={score}, timestamp={timestamp}")
-                    return True
-                else:
-                    logger.error(f"Database query failed: {result.get('errors', 'Unknown error')}")
-                    return False
-            else:
+            if response.status_code != 200:
                 logger.error(f"API request failed: {response.status_code} - {response.text}")
-                return False
+                if response.status_code in RETRYABLE_STATUS_CODES or response.status_code >= 500:
+                    return UploadResult.RETRY
+                return UploadResult.REJECTED
+            
+            result = response.json()
+            if not result.get('success', False):
+                logger.error(f"Database query failed: {result.get('errors', 'Unknown error')}")
+                return UploadResult.REJECTED
+            
+            logger.info("Successfully uploaded %d rows: %s to %s", len(rows), rows[0]['timestamp'], rows[-1]['timestamp'])
+            return UploadResult.OK
                 
-        except Exception as e:
+        except requests.RequestException as e:
             logger.error(f"Error uploading to database: {e}")
-            return False
+            return UploadResult.RETRY
+        except Exception as e:
+            logger.error(f"Error preparing upload: {e}")
+            return UploadResult.REJECTED
+
+    def close(self):
+        """Close pooled HTTP connections"""
+        self.session.close()
+
+class SqliteSpool:
+    """Durable local queue of samples waiting to be uploaded"""
+    
+    def __init__(self, path: str = "busyness_spool.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                metadata TEXT,
+                notes TEXT,
+                camera_name TEXT,
+                uploaded INTEGER NOT NULL DEFAULT 0  -- 0 pending, 1 uploaded, -1 rejected
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_spool_pending ON spool(uploaded, id)")
+        self.conn.commit()
+        
+    def add(self, data: dict, notes: str = "", camera_name: str = ""):
+        """Store a sample until it has been uploaded"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO spool (timestamp, score, metadata, notes, camera_name) VALUES (?, ?, ?, ?, ?)",
+                (data['timestamp'], data['score'], dumps_json(data['metadata']), notes, camera_name)
+            )
+            self.conn.commit()
+    
+    def pending(self, limit: int) -> List[Tuple[int, dict]]:
+        """Return up to limit (id, data) pairs not yet uploaded, oldest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, timestamp, score, metadata, notes, camera_name FROM spool "
+                "WHERE uploaded = 0 ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            (row_id, {
+                'timestamp': timestamp,
+                'score': score,
+                'metadata': loads_json(metadata),
+                'notes': notes,
+                'camera_name': camera_name
+            })
+            for row_id, timestamp, score, metadata, notes, camera_name in rows
+        ]
+    
+    def pending_count(self) -> int:
+        """Number of samples not yet uploaded"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM spool WHERE uploaded = 0").fetchone()[0]
+    
+    def mark_uploaded(self, ids: List[int]):
+        """Flag samples as uploaded so they are not sent again"""
+        with self._lock:
+            self.conn.executemany("UPDATE spool SET uploaded = 1 WHERE id = ?", [(row_id,) for row_id in ids])
+            self.conn.commit()
+    
+    def mark_rejected(self, ids: List[int]):
+        """Quarantine samples D1 refused, keeping them for inspection"""
+        with self._lock:
+            self.conn.executemany("UPDATE spool SET uploaded = -1 WHERE id = ?", [(row_id,) for row_id in ids])
+            self.conn.commit()
+    
+    def purge_uploaded(self):
+        """Delete samples that have already been uploaded"""
+        with self._lock:
+            self.conn.execute("DELETE FROM spool WHERE uploaded = 1")
+            self.conn.commit()
+    
+    def close(self):
+        """Close the spool database"""
+        with self._lock:
+            self.conn.close()
 
 class BusynessMonitor:
     """Main class that orchestrates the entire monitoring process"""
     
     def __init__(self, api_token: str, account_id: str, database_id: str, 
-                 camera_index: int = 0, interval: int = 5, notes: str = "", camera_name: str = ""):
+                 camera_index: int = 0, interval: int = 5, notes: str = "", camera_name: str = "",
+                 spool_path: str = "busyness_spool.db"):
         self.camera = CameraCapture(camera_index)
         self.evaluator = BusynessEvaluator()
         self.uploader = CloudflareUploader(api_token, account_id, database_id)
@@ -241,6 +512,15 @@ class BusynessMonitor:
         self.camera_name = camera_name
         self.running = False
         
+        # Samples are spooled to disk and drained by a background thread, so
+        # network latency never delays the next capture and outages lose no data
+        self.spool = SqliteSpool(spool_path)
+        self._uploader_thread = None
+        self._stop_uploading = threading.Event()
+        self._upload_wakeup = threading.Event()
+        self.rejected_samples = 0
+        self._cleaned_up = False
+        
     def initialize(self) -> bool:
         """Initialize all components"""
         logger.info("Initializing Busyness Monitor...")
@@ -249,6 +529,10 @@ class BusynessMonitor:
             logger.error("Failed to initialize camera")
             return False
         
+        self._stop_uploading.clear()
+        self._uploader_thread = threading.Thread(target=self._uploader_loop, name="uploader", daemon=True)
+        self._uploader_thread.start()
+        
         logger.info("Busyness Monitor initialized successfully")
         return True
     
@@ -272,25 +556,98 @@ class BusynessMonitor:
                 'metadata': metadata
             }
             
-            logger.info(f"Analysis complete: Score={score}, Timestamp={timestamp}")
+            logger.info("Analysis complete: Score=%s, Timestamp=%s", score, timestamp)
             return data
             
         except Exception as e:
             logger.error(f"Error in capture and analyze: {e}")
             return None
     
-    def upload_data(self, data: dict) -> bool:
-        """Upload data to Cloudflare D1"""
-        return self.uploader.upload_busyness_data(
-            data['score'],
-            data['metadata'],
-            data['timestamp'],
-            self.notes,
-            self.camera_name
-        )
+    def upload_batch(self, batch: List[dict]) -> UploadResult:
+        """Upload several samples to Cloudflare D1 in as few requests as possible"""
+        return self.uploader.flush_batch(batch, self.notes, self.camera_name)
+    
+    def _uploader_loop(self):
+        """Upload spooled samples in batches until stopped and drained"""
+        delay = 1
+        batch_deadline = None
+        while True:
+            stopping = self._stop_uploading.is_set()
+            try:
+                self._upload_wakeup.clear()
+                pending = self.spool.pending(MAX_ROWS_PER_INSERT)
+                
+                if not pending:
+                    if stopping:
+                        break
+                    self.spool.purge_uploaded()
+                    self._upload_wakeup.wait()
+                    continue
+                
+                # Let a partial batch wait for more samples, but not too long
+                if len(pending) < MAX_ROWS_PER_INSERT and not stopping:
+                    if batch_deadline is None:
+                        batch_deadline = time.monotonic() + UPLOAD_BATCH_WAIT
+                    remaining = batch_deadline - time.monotonic()
+                    if remaining > 0:
+                        self._upload_wakeup.wait(remaining)
+                        continue
+                
+                result = self.upload_batch([data for _, data in pending])
+                if result is UploadResult.OK:
+                    self.spool.mark_uploaded([row_id for row_id, _ in pending])
+                elif result is UploadResult.REJECTED:
+                    result = self._upload_individually(pending)
+                if result is not UploadResult.RETRY:
+                    batch_deadline = None
+                    delay = 1
+                    continue
+                
+                if stopping:
+                    logger.warning("Upload failed during shutdown, %d samples kept in spool for the next run", self.spool.pending_count())
+                    break
+                logger.warning("Upload failed, retrying in %ss", delay)
+            except Exception as e:
+                if stopping:
+                    logger.error(f"Error in uploader during shutdown: {e}")
+                    break
+                logger.error(f"Error in uploader, retrying in {delay}s: {e}")
+            
+            self._stop_uploading.wait(delay)
+            delay = min(delay * 2, 60)
+    
+    def _upload_individually(self, pending: List[Tuple[int, dict]]) -> UploadResult:
+        """Upload rows one at a time after a batch was rejected, quarantining the bad ones.
+        
+        If every row is rejected on its own the problem isn't row-specific (for
+        example a missing table), so nothing is quarantined and RETRY is returned.
+        """
+        rejected = []
+        if len(pending) > 1:
+            for row_id, data in pending:
+                result = self.upload_batch([data])
+                if result is UploadResult.RETRY:
+                    return result
+                if result is UploadResult.OK:
+                    self.spool.mark_uploaded([row_id])
+                else:
+                    rejected.append((row_id, data))
+        else:
+            # A lone row was already rejected on its own by the batch upload
+            rejected = list(pending)
+        
+        if len(rejected) == len(pending):
+            logger.error("D1 rejected every sample in the batch, keeping them in the spool; check the database setup")
+            return UploadResult.RETRY
+        
+        for row_id, data in rejected:
+            logger.error("Quarantining sample from %s rejected by D1: %s", data['timestamp'], data)
+        self.spool.mark_rejected([row_id for row_id, _ in rejected])
+        self.rejected_samples += len(rejected)
+        return UploadResult.OK
     
     def run_once(self) -> bool:
-        """Run one complete cycle: capture, analyze, upload"""
+        """Run one complete cycle: capture, analyze, spool for upload"""
         try:
             logger.info("Starting monitoring cycle...")
             
@@ -300,13 +657,12 @@ class BusynessMonitor:
                 logger.error("Failed to capture and analyze")
                 return False
             
-            # Upload to database
-            if self.upload_data(data):
-                logger.info("Cycle completed successfully")
-                return True
-            else:
-                logger.error("Failed to upload data")
-                return False
+            # Persist locally, then let the uploader thread pick it up
+            self.spool.add(data, self.notes, self.camera_name)
+            self._upload_wakeup.set()
+            
+            logger.info("Cycle completed successfully")
+            return True
                 
         except Exception as e:
             logger.error(f"Error in monitoring cycle: {e}")
@@ -318,10 +674,18 @@ class BusynessMonitor:
         logger.info(f"Starting continuous monitoring (interval: {self.interval}s)")
         
         try:
+            # Schedule captures on fixed deadlines so cycle time doesn't add drift
+            next_capture = time.monotonic()
             while self.running:
                 self.run_once()
-                logger.info(f"Waiting {self.interval} seconds until next capture...")
-                time.sleep(self.interval)
+                next_capture += self.interval
+                delay = next_capture - time.monotonic()
+                if delay <= 0:
+                    logger.warning("Cycle overran the %ss interval by %.2fs", self.interval, -delay)
+                    next_capture = time.monotonic()
+                    continue
+                logger.info("Waiting %.2f seconds until next capture...", delay)
+                time.sleep(delay)
                 
         except KeyboardInterrupt:
             logger.info("Monitoring stopped by user")
@@ -330,10 +694,39 @@ class BusynessMonitor:
         finally:
             self.cleanup()
     
+    def stop_uploader(self, timeout: float = 30) -> bool:
+        """Give spooled data one last upload attempt and stop the uploader.
+        
+        Returns True if every sample was uploaded and none were rejected.
+        """
+        if self._uploader_thread is not None:
+            self._stop_uploading.set()
+            self._upload_wakeup.set()
+            self._uploader_thread.join(timeout=timeout)
+            if self._uploader_thread.is_alive():
+                logger.warning("Uploader did not finish, remaining samples stay in the spool for the next run")
+                return False
+            self._uploader_thread = None
+        
+        return self.spool.pending_count() == 0 and self.rejected_samples == 0
+    
     def cleanup(self):
-        """Clean up resources"""
+        """Clean up resources; safe to call more than once"""
         self.running = False
+        if self._cleaned_up:
+            return
+        self._cleaned_up = True
+        
         self.camera.release_camera()
+        self.evaluator.close()
+        
+        self.stop_uploader()
+        
+        # The spool stays open while a timed-out uploader may still be using it
+        if self._uploader_thread is None:
+            self.spool.close()
+        
+        self.uploader.close()
         logger.info("Cleanup completed")
 
 def main():
@@ -347,6 +740,7 @@ def main():
     parser.add_argument('--interval', type=int, default=5, help='Capture interval in seconds (default: 5)')
     parser.add_argument('--notes', type=str, default='', help='Notes/context for this monitoring session')
     parser.add_argument('--once', action='store_true', help='Run once instead of continuously')
+    parser.add_argument('--spool', type=str, default='busyness_spool.db', help='Local SQLite file for samples awaiting upload (default: busyness_spool.db)')
     
     args = parser.parse_args()
     
@@ -358,7 +752,8 @@ def main():
         camera_index=args.camera,
         interval=args.interval,
         notes=args.notes,
-        camera_name=args.camera_name
+        camera_name=args.camera_name,
+        spool_path=args.spool
     )
     
     # Initialize
@@ -368,8 +763,10 @@ def main():
     
     try:
         if args.once:
-            # Run once
-            success = monitor.run_once()
+            # Run once, waiting for the upload so the exit code reflects it
+            success = monitor.run_once() and monitor.stop_uploader()
+            if not success:
+                logger.error("Sample was not uploaded")
             return 0 if success else 1
         else:
             # Run continuously
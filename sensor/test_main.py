@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local spool, batched uploads, the HTTP retry policy
+and the evaluator's static-frame and numba paths
+These run without a camera or network access
+"""
+
+import sys
+import os
+import threading
+
+import numpy as np
+import pytest
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+
+# Add the current directory to the path so we can import from main.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import (
+    BusynessEvaluator, BusynessMonitor, CloudflareUploader, SqliteSpool, UploadResult,
+    MAX_ROWS_PER_INSERT, UPLOAD_COLUMNS
+)
+
+def make_sample(i, score=5):
+    return {'timestamp': f"2024-01-01T00:00:{i:02d}", 'score': score, 'metadata': {'motion_ratio': 0.1 * i}}
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.text = str(body)
+        self._body = body if body is not None else {'success': True, 'result': []}
+
+    def json(self):
+        return self._body
+
+class FakeSession:
+    """Records posted payloads and replies with queued responses"""
+    def __init__(self, responses=None):
+        self.payloads = []
+        self.responses = list(responses or [])
+
+    def post(self, url, json=None, timeout=None):
+        self.payloads.append(json)
+        return self.responses.pop(0) if self.responses else FakeResponse()
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = SqliteSpool(str(tmp_path / "spool.db"))
+    yield spool
+    spool.close()
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = BusynessMonitor("token", "account", "database", notes="n", camera_name="cam",
+                              spool_path=str(tmp_path / "spool.db"))
+    yield monitor
+    monitor.cleanup()
+
+def test_spool_returns_pending_in_order(spool):
+    for i in range(3):
+        spool.add(make_sample(i), "notes", "cam")
+
+    pending = spool.pending(2)
+    assert [data['timestamp'] for _, data in pending] == ["2024-01-01T00:00:00", "2024-01-01T00:00:01"]
+    assert pending[0][1]['metadata'] == {'motion_ratio': 0.0}
+    assert pending[0][1]['notes'] == "notes"
+    assert pending[0][1]['camera_name'] == "cam"
+    assert spool.pending_count() == 3
+
+def test_spool_mark_uploaded_and_purge(spool):
+    spool.add(make_sample(0))
+    spool.add(make_sample(1))
+    first_id = spool.pending(1)[0][0]
+
+    spool.mark_uploaded([first_id])
+    assert spool.pending_count() == 1
+
+    spool.purge_uploaded()
+    assert spool.conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0] == 1
+
+def test_spool_rejected_rows_are_kept_but_not_pending(spool):
+    spool.add(make_sample(0))
+    row_id = spool.pending(1)[0][0]
+
+    spool.mark_rejected([row_id])
+    spool.purge_uploaded()
+    assert spool.pending_count() == 0
+    assert spool.conn.execute("SELECT uploaded FROM spool").fetchall() == [(-1,)]
+
+def test_flush_batch_sends_one_insert_within_d1_param_limit():
+    uploader = CloudflareUploader("token", "account", "database")
+    uploader.session = FakeSession()
+    rows = [make_sample(i) for i in range(MAX_ROWS_PER_INSERT)]
+
+    assert uploader.flush_batch(rows, "notes", "cam") is UploadResult.OK
+    assert len(uploader.session.payloads) == 1
+    params = uploader.session.payloads[0]['params']
+    assert len(params) == MAX_ROWS_PER_INSERT * len(UPLOAD_COLUMNS) <= 100
+    assert params[-2:] == ["notes", "cam"]
+
+def test_flush_batch_refuses_oversized_batches():
+    uploader = CloudflareUploader("token", "account", "database")
+    uploader.session = FakeSession()
+
+    with pytest.raises(ValueError):
+        uploader.flush_batch([make_sample(i) for i in range(MAX_ROWS_PER_INSERT + 1)])
+    assert uploader.session.payloads == []
+
+@pytest.mark.parametrize("response, expected", [
+    (FakeResponse(503, "unavailable"), UploadResult.RETRY),
+    (FakeResponse(429, "slow down"), UploadResult.RETRY),
+    (FakeResponse(401, "bad token"), UploadResult.RETRY),
+    (FakeResponse(404, "no such database"), UploadResult.RETRY),
+    (FakeResponse(400, "bad request"), UploadResult.REJECTED),
+    (FakeResponse(200, {'success': False, 'errors': ['constraint failed']}), UploadResult.REJECTED),
+])
+def test_flush_batch_classifies_failures(response, expected):
+    uploader = CloudflareUploader("token", "account", "database")
+    uploader.session = FakeSession([response])
+    assert uploader.flush_batch([make_sample(0)]) is expected
+
+def test_uploader_drains_spool_in_batches(monitor):
+    batches = []
+    monitor.upload_batch = lambda batch: batches.append(len(batch)) or UploadResult.OK
+    for i in range(MAX_ROWS_PER_INSERT + 2):
+        monitor.spool.add(make_sample(i))
+
+    # With stop requested the loop flushes everything without waiting
+    monitor._stop_uploading.set()
+    monitor._uploader_loop()
+
+    assert batches == [MAX_ROWS_PER_INSERT, 2]
+    assert monitor.spool.pending_count() == 0
+
+def test_uploader_quarantines_only_rejected_rows(monitor):
+    def upload_batch(batch):
+        if any(data['score'] == 99 for data in batch):
+            return UploadResult.REJECTED
+        return UploadResult.OK
+    monitor.upload_batch = upload_batch
+    monitor.spool.add(make_sample(0))
+    monitor.spool.add(make_sample(1, score=99))
+    monitor.spool.add(make_sample(2))
+
+    monitor._stop_uploading.set()
+    monitor._uploader_loop()
+
+    statuses = monitor.spool.conn.execute("SELECT score, uploaded FROM spool ORDER BY id").fetchall()
+    assert statuses == [(5, 1), (99, -1), (5, 1)]
+
+@pytest.mark.parametrize("count", [1, 3])
+def test_uploader_keeps_rows_when_d1_rejects_all_of_them(monitor, count):
+    monitor.upload_batch = lambda batch: UploadResult.REJECTED
+    for i in range(count):
+        monitor.spool.add(make_sample(i))
+
+    monitor._stop_uploading.set()
+    monitor._uploader_loop()
+
+    # e.g. a missing table: not the rows' fault, so none are quarantined
+    assert monitor.spool.pending_count() == count
+    assert monitor.rejected_samples == 0
+
+def test_uploader_keeps_rows_when_upload_keeps_failing(monitor):
+    monitor.upload_batch = lambda batch: UploadResult.RETRY
+    monitor.spool.add(make_sample(0))
+
+    monitor._stop_uploading.set()
+    monitor._uploader_loop()
+
+    assert monitor.spool.pending_count() == 1
+
+def test_stop_uploader_reports_pending_rows(monitor):
+    monitor.upload_batch = lambda batch: UploadResult.RETRY
+    monitor.spool.add(make_sample(0))
+    monitor._uploader_thread = threading.Thread(target=monitor._uploader_loop, daemon=True)
+    monitor._uploader_thread.start()
+
+    assert monitor.stop_uploader(timeout=5) is False
+    assert monitor.spool.pending_count() == 1
+
+def test_stop_uploader_succeeds_once_spool_is_drained(monitor):
+    monitor.upload_batch = lambda batch: UploadResult.OK
+    monitor.spool.add(make_sample(0))
+    monitor._uploader_thread = threading.Thread(target=monitor._uploader_loop, daemon=True)
+    monitor._uploader_thread.start()
+
+    assert monitor.stop_uploader(timeout=5) is True
+
+def test_cleanup_runs_once(monitor):
+    closes = []
+    monitor.evaluator.close = lambda: closes.append("evaluator")
+    monitor.spool.close = lambda: closes.append("spool")
+
+    monitor.cleanup()
+    monitor.cleanup()
+
+    assert closes == ["evaluator", "spool"]
+
+def test_static_frames_still_update_motion():
+    evaluator = BusynessEvaluator()
+    applied = []
+    subtractor = evaluator.bg_subtractor
+
+    class CountingSubtractor:
+        def apply(self, image):
+            applied.append(image.shape)
+            return subtractor.apply(image)
+    evaluator.bg_subtractor = CountingSubtractor()
+
+    try:
+        frame = np.random.default_rng(0).integers(0, 255, (360, 640, 3), dtype=np.uint8)
+        _, first = evaluator.calculate_busyness_score(frame)
+        results = [evaluator.calculate_busyness_score(frame)[1] for _ in range(5)]
+    finally:
+        evaluator.close()
+
+    # Motion detection keeps running and the background model absorbs the scene
+    assert len(applied) == 6
+    assert results[-1]['motion_ratio'] < first['motion_ratio']
+    assert all(r['edge_ratio'] == first['edge_ratio'] for r in results)
+
+def test_uploader_session_retries_only_unapplied_posts():
+    uploader = CloudflareUploader("token", "account", "database")
+    retry = uploader.session.get_adapter("https://api.cloudflare.com").max_retries
+
+    assert retry.is_retry("POST", 503)
+    assert retry.is_retry("POST", 429)
+    assert not retry.is_retry("POST", 500)
+    assert uploader.session.headers['Authorization'] == "Bearer token"
+
+    # A read timeout may come after D1 applied the INSERT, so it isn't re-sent
+    with pytest.raises(MaxRetryError):
+        retry.increment("POST", "/query", error=ReadTimeoutError(None, "/query", "timed out"))
+    uploader.close()
+
+@pytest.mark.skipif(main.njit is None, reason="numba is not installed")
+def test_jit_reduction_matches_opencv():
+    rng = np.random.default_rng(1)
+    gray = rng.integers(0, 256, (180, 320), dtype=np.uint8)
+    motion_mask = (rng.random((180, 320)) < 0.2).astype(np.uint8) * 255
+    edges = (rng.random((180, 320)) < 0.1).astype(np.uint8) * 255
+
+    jit_motion, jit_edges, jit_variance = main._reduce_frame_jit(gray, motion_mask, edges)
+    cv_motion, cv_edges, cv_variance = main._reduce_frame_cv(gray, motion_mask, edges)
+
+    assert (jit_motion, jit_edges) == (cv_motion, cv_edges)
+    assert jit_variance == pytest.approx(cv_variance, rel=1e-6)
@@ -15,27 +15,20 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from main import BusynessEvaluator, CameraCapture
 
-def test_camera_capture():
+def check_camera_capture(camera):
     """Test camera capture functionality"""
     print("Testing camera capture...")
     
-    camera = CameraCapture(0)
-    if not camera.initialize_camera():
-        print("❌ Failed to initialize camera")
-        return False
-    
     # Capture a test image
     image = camera.capture_image()
     if image is None:
         print("❌ Failed to capture image")
-        camera.release_camera()
         return False
     
     print(f"✅ Successfully captured image: {image.shape}")
-    camera.release_camera()
     return True
 
-def test_busyness_evaluation():
+def check_busyness_evaluation():
     """Test busyness evaluation with a test image"""
     print("Testing busyness evaluation...")
     
@@ -46,8 +39,13 @@ def test_busyness_evaluation():
     cv2.rectangle(test_image, (100, 100), (200, 200), (255, 255, 255), -1)
     cv2.circle(test_image, (400, 300), 50, (128, 128, 128), -1)
     
+    # Use a throwaway evaluator so the synthetic frame doesn't seed the
+    # background model or static-frame cache used for the camera
     evaluator = BusynessEvaluator()
-    score, metadata = evaluator.calculate_busyness_score(test_image)
+    try:
+        score, metadata = evaluator.calculate_busyness_score(test_image)
+    finally:
+        evaluator.close()
     
     print(f"✅ Busyness evaluation completed:")
     print(f"   Score: {score}/10")
@@ -58,18 +56,11 @@ def test_busyness_evaluation():
     
     return True
 
-def test_full_cycle():
+def check_full_cycle(camera, evaluator):
     """Test a complete capture and analysis cycle"""
     print("Testing full capture and analysis cycle...")
     
-    camera = CameraCapture(0)
-    evaluator = BusynessEvaluator()
-    
     try:
-        if not camera.initialize_camera():
-            print("❌ Failed to initialize camera")
-            return False
-        
         # Capture image
         image = camera.capture_image()
         if image is None:
@@ -91,33 +82,42 @@ def test_full_cycle():
     except Exception as e:
         print(f"❌ Error in full cycle test: {e}")
         return False
-    finally:
-        camera.release_camera()
 
 def main():
     """Run all tests"""
     print("🧪 Testing MacBook Camera Busyness Monitor System")
     print("=" * 50)
     
+    # Open the camera once and share it across checks
+    # (capture_image fails cleanly if the camera could not be opened)
+    camera = CameraCapture(0)
+    if not camera.initialize_camera():
+        print("❌ Failed to initialize camera")
+    evaluator = BusynessEvaluator()
+    
     tests = [
-        ("Camera Capture", test_camera_capture),
-        ("Busyness Evaluation", test_busyness_evaluation),
-        ("Full Cycle", test_full_cycle)
+        ("Camera Capture", lambda: check_camera_capture(camera)),
+        ("Busyness Evaluation", check_busyness_evaluation),
+        ("Full Cycle", lambda: check_full_cycle(camera, evaluator))
     ]
     
     passed = 0
     total = len(tests)
     
-    for test_name, test_func in tests:
-        print(f"\n🔍 Running {test_name} test...")
-        try:
-            if test_func():
-                print(f"✅ {test_name} test passed")
-                passed += 1
-            else:
-                print(f"❌ {test_name} test failed")
-        except Exception as e:
-            print(f"❌ {test_name} test failed with error: {e}")
+    try:
+        for test_name, test_func in tests:
+            print(f"\n🔍 Running {test_name} test...")
+            try:
+                if test_func():
+                    print(f"✅ {test_name} test passed")
+                    passed += 1
+                else:
+                    print(f"❌ {test_name} test failed")
+            except Exception as e:
+                print(f"❌ {test_name} test failed with error: {e}")
+    finally:
+        camera.release_camera()
+        evaluator.close()
     
     print("\n" + "=" * 50)
     print(f"📊 Test Results: {passed}/{total} tests passed")